@@ -1,7 +1,8 @@
 import os, sys, re
-import logging, traceback
+import logging
 import time
-import threading
+import heapq
+import struct
 from threading import Thread, Event, RLock
 from queue import Queue, Empty
 from enum import Enum, auto
@@ -10,7 +11,6 @@ from pathlib import Path
 
 import zlib
 
-from .burntool_timer import BurnToolTimer
 from .burntool_serial import BurnToolSerial, burn_tool_serial_get_ports
 from .burntool_util import intelhex_to_data_array, taolink_hex_to_data_array
 
@@ -59,6 +59,29 @@ class BurnToolOpCode(Enum):
     UP_OPCODE_BLOCK64K_ERASE = 0x1D
     UP_OPCODE_BLOCK64K_ERASE_ACK = 0x1E
 
+# frame header: opcode, address, length
+_HDR = struct.Struct('<BIH')
+
+# READ requests carry a length but no payload
+_OP_READ = BurnToolOpCode.UP_OPCODE_READ.value
+
+# per-page flash program opcodes, looked up once instead of per frame
+_OP_WRITE = BurnToolOpCode.UP_OPCODE_WRITE.value
+_OP_WRITE_ACK = BurnToolOpCode.UP_OPCODE_WRITE_ACK.value
+
+_OPCODE_VALUES = frozenset(op.value for op in BurnToolOpCode)
+
+# 256-entry lookup table, non-zero for every valid opcode byte
+_OPCODE_VALID = bytes(1 if i in _OPCODE_VALUES else 0 for i in range(256))
+
+# matches the next valid opcode byte, used to resync after garbage
+_OPCODE_RE = re.compile(b'[' + re.escape(bytes(sorted(_OPCODE_VALUES))) + b']')
+
+# handshake tokens, all ascii so they are matched on the raw bytes
+_TURMASS = b'TurMass.'
+_TAOLINK = b'TaoLink.'
+_OK = b'ok'
+
 class BurnToolStatus(Enum):
     IDLE = auto()
     WAIT_ACK = auto()
@@ -75,27 +98,25 @@ class BurnToolEvent(Enum):
 
 class BurnToolFrame:
     def __init__(self):
-        self.response_tab = {
-            BurnToolOpCode.UP_OPCODE_GET_TYPE.value: self.send_type,
-            BurnToolOpCode.UP_OPCODE_WRITE_RAM.value: self.write_ram_ack,
-        }
+        # indexed by opcode byte, None for opcodes without a response
+        self.response_tab = [None] * 256
+        self.response_tab[BurnToolOpCode.UP_OPCODE_GET_TYPE.value] = self.send_type
+        self.response_tab[BurnToolOpCode.UP_OPCODE_WRITE_RAM.value] = self.write_ram_ack
 
     def pack(self, opcode, address=0, data=b''):
-        msg = b''
-        msg += opcode.to_bytes(1, 'little')
-        msg += address.to_bytes(4, 'little')
-        msg += int(len(data)).to_bytes(2, 'little')
-        if opcode != BurnToolOpCode.UP_OPCODE_READ.value:
-            msg += data
-        return msg
+        header = _HDR.pack(opcode, address, len(data))
+        if opcode != _OP_READ:
+            return header + data
+        return header
 
     def parse(self, frame):
-        opcode = frame[0]
-        address = int.from_bytes(frame[1:5], 'little')
-        length = int.from_bytes(frame[5:7], 'little')
-        data = frame[7:]
+        if len(frame) < _HDR.size:
+            logging.warning("short frame: %s", bytes(frame).hex())
+            return None
+        opcode, address, length = _HDR.unpack_from(frame, 0)
+        data = frame[_HDR.size:]
 
-        logging.debug(f"parse frame: {opcode:02X}, 0x{address:08X}, {length}")
+        logging.debug("parse frame: %02X, 0x%08X, %d", opcode, address, length)
 
         return opcode, address, data
 
@@ -133,11 +154,16 @@ class BurnToolFrame:
         )
 
     def response(self, frame):
-        opcode, address, data = self.parse(frame)
-        if opcode in self.response_tab.keys():
-            return self.response_tab[opcode](address, data)
-        else:
-            logging.warning(f"unknown opcode: 0x{opcode:02X}")
+        parsed = self.parse(frame)
+        if parsed is None:
+            return None
+        return self.dispatch(*parsed)
+
+    def dispatch(self, opcode, address=0x0, data=b''):
+        handler = self.response_tab[opcode]
+        if handler is not None:
+            return handler(address, data)
+        logging.warning(f"unknown opcode: 0x{opcode:02X}")
 
     def to_bytes(self):
         return bytes([self.opcode]) + self.data
@@ -149,10 +175,23 @@ class BurnToolFrame:
         return BurnToolFrame(opcode, data)
 
 class BurnToolRxPkt:
-    def __init__(self) -> None:
-        self.opcodes = [v.value for _, v in BurnToolOpCode.__members__.items()]
+    # frames whose length field is not followed by a payload
+    _NODATA_ACKS = frozenset({
+        BurnToolOpCode.UP_OPCODE_READ.value,
+        BurnToolOpCode.UP_OPCODE_WRITE_RAM_ACK.value,
+        BurnToolOpCode.UP_OPCODE_WRITE_ACK.value,
+        BurnToolOpCode.UP_OPCODE_DISCONNECT_ACK.value,
+        BurnToolOpCode.UP_OPCODE_SECTOR_ERASE_ACK.value,
+        BurnToolOpCode.UP_OPCODE_CALC_CRC32_ACK.value,
+        BurnToolOpCode.UP_OPCODE_EXECUTE_CODE_END.value,
+        BurnToolOpCode.UP_OPCODE_CHANGE_BAUDRATE_ACK.value,
+        BurnToolOpCode.UP_OPCODE_BLOCK32K_ERASE_ACK.value,
+        BurnToolOpCode.UP_OPCODE_BLOCK64K_ERASE_ACK.value,
+    })
 
-        self.data = b''
+    def __init__(self) -> None:
+        self.data = bytearray()
+        self._pos = 0
 
         self.sta = BurnToolRxStatus.HEAD
         self.frm_opcode = None
@@ -160,68 +199,90 @@ class BurnToolRxPkt:
         self.frm_len = 0
         self.frm_data = b''
 
-        self.timer = BurnToolTimer(self.timeout, 0.5)
+        # a partial frame older than this is dropped when the next data arrives
+        self.deadline = 0.0
         self.rxq = Queue()
 
         self.rxl = []
 
-    def timeout(self):
-        self.timer.stop()
+        # rx() runs on the rx thread while the host may call timeout()
+        self.lock = RLock()
 
-        self.data = b''
+    def timeout(self):
+        with self.lock:
+            self.data = bytearray()
+            self._pos = 0
 
-        self.sta = BurnToolRxStatus.HEAD
+            self.sta = BurnToolRxStatus.HEAD
 
-        self.frm_opcode = None
-        self.frm_addr = None
-        self.frm_len = 0
-        self.frm_data_len = 0
-        self.frm_data = b''
+            self.frm_opcode = None
+            self.frm_addr = None
+            self.frm_len = 0
+            self.frm_data_len = 0
+            self.frm_data = b''
 
         logging.debug("timeout")
 
     def rx(self, data):
-        self.data += data
-        self.timer.start(0.5)
-        while len(self.data) >= 7:
-            if self.sta == BurnToolRxStatus.HEAD:
-                while len(self.data) >= 7:
-                    if self.data[0] in self.opcodes:
-                        self.frm_opcode = self.data[0]
-                        self.frm_addr = int.from_bytes(self.data[1:5], 'little')
-                        self.frm_len = int.from_bytes(self.data[5:7], 'little')
-                        self.sta = BurnToolRxStatus.DATA
-                        self.data = self.data[7:]
-
-                        self.frm_data_len = self.frm_len
-                        if self.frm_opcode in [
-                            BurnToolOpCode.UP_OPCODE_WRITE_RAM_ACK.value,
-                            BurnToolOpCode.UP_OPCODE_WRITE_ACK.value,
-                            BurnToolOpCode.UP_OPCODE_DISCONNECT_ACK.value,
-                            BurnToolOpCode.UP_OPCODE_SECTOR_ERASE_ACK.value,
-                            BurnToolOpCode.UP_OPCODE_CALC_CRC32_ACK.value,
-                            BurnToolOpCode.UP_OPCODE_EXECUTE_CODE_END.value,
-                            BurnToolOpCode.UP_OPCODE_CHANGE_BAUDRATE_ACK.value,
-                            BurnToolOpCode.UP_OPCODE_BLOCK32K_ERASE_ACK.value,
-                            BurnToolOpCode.UP_OPCODE_BLOCK64K_ERASE_ACK.value,
-                        ]:
-                            self.frm_data_len = 0
-
-                        if self.frm_data_len == 0:
-                            self.sta = BurnToolRxStatus.HEAD
-                            self.rxq.put((self.frm_opcode, self.frm_addr, self.frm_len, b''))
-                            self.timer.stop()
-                        break
-                    else:
-                        self.data = self.data[1:]
-            elif self.sta == BurnToolRxStatus.DATA:
-                if len(self.data) >= self.frm_data_len:
-                    self.sta = BurnToolRxStatus.HEAD
-                    self.rxq.put((self.frm_opcode, self.frm_addr, self.frm_len, self.data[:self.frm_data_len]))
-                    self.data = self.data[self.frm_data_len:]
-                    self.timer.stop()
+        with self.lock:
+            self._rx(data)
+
+    def _rx(self, data):
+        now = time.monotonic()
+        if now > self.deadline and (self.sta != BurnToolRxStatus.HEAD or len(self.data) > self._pos):
+            self.timeout()
+        self.deadline = now + 0.5
+
+        # hot path: work on locals and write the state back on exit
+        buf = self.data
+        pos = self._pos
+        sta = self.sta
+        put = self.rxq.put
+        valid = _OPCODE_VALID
+        nodata = self._NODATA_ACKS
+        HEAD = BurnToolRxStatus.HEAD
+        DATA = BurnToolRxStatus.DATA
+
+        # drop consumed bytes once the cursor has moved past half of the buffer
+        if pos > 4096 and pos * 2 > len(buf):
+            del buf[:pos]
+            pos = 0
+        buf.extend(data)
+        # one flat loop, one frame (or one resync jump) per iteration
+        while True:
+            if sta == HEAD:
+                if len(buf) - pos < 7:
+                    break
+                if not valid[buf[pos]]:
+                    m = _OPCODE_RE.search(buf, pos + 1)
+                    pos = m.start() if m else len(buf)
+                    continue
+
+                frm_opcode, frm_addr, frm_len = _HDR.unpack_from(buf, pos)
+                self.frm_opcode = frm_opcode
+                self.frm_addr = frm_addr
+                self.frm_len = frm_len
+                pos += 7
+
+                frm_data_len = frm_len
+                if frm_opcode in nodata:
+                    frm_data_len = 0
+                self.frm_data_len = frm_data_len
+
+                if frm_data_len == 0:
+                    put((frm_opcode, frm_addr, frm_len, b''))
                 else:
+                    sta = DATA
+            else:
+                frm_data_len = self.frm_data_len
+                if len(buf) - pos < frm_data_len:
                     break
+                sta = HEAD
+                put((self.frm_opcode, self.frm_addr, self.frm_len, bytes(memoryview(buf)[pos:pos + frm_data_len])))
+                pos += frm_data_len
+
+        self._pos = pos
+        self.sta = sta
 
 def log_set_level(debug):
     if debug:
@@ -237,12 +298,32 @@ def log_set_level(debug):
 
 #---------------------------------------------------------------------------------------------
 # Host
+class BurnToolPendingWrite:
+    # a windowed write waiting for its ack
+    __slots__ = ('ack', 'frame', 'tries', 'deadline', 'timeout')
+
+    def __init__(self, ack, frame, deadline, timeout):
+        self.ack = ack
+        self.frame = frame
+        self.tries = 0
+        self.deadline = deadline
+        self.timeout = timeout
+
 class BurnToolHost:
-    def __init__(self, port, fw="fw.hex", patch=None, wait=False, debug=False):
+    def __init__(self, port, fw="fw.hex", patch=None, wait=False, debug=False, window=1):
         log_set_level(debug)
 
         self.port = port
 
+        # max flash writes in flight, 1 is plain stop-and-wait; larger windows are
+        # experimental, they rely on the bootloader echoing page addresses in WRITE_ACK
+        self.window = max(1, window)
+        self.pending = {}
+        self.deadlines = []
+        # acks still owed for frames resent while their first ack was only slow
+        self.late_acks = 0
+        self.late_deadline = 0.0
+
         if patch is not None:
             # 使用用户提供路径
             self.patch = Path(patch).resolve()
@@ -273,23 +354,16 @@ class BurnToolHost:
         ]
 
         self.wait = wait
-        self.wait_data = b''
+        self.wait_data = bytearray()
         self.wait_ack = False
 
         self.ts = 0
 
         self.fw_tail = bytes.fromhex('0104230051525251')
 
-        taolink = False
-        # check if ':' in fw content
-        with open(self.fw, 'r') as f:
-            for line in f:
-                if ':' in line:
-                    taolink = False
-                    break
-                else:
-                    taolink = True
-                    break
+        # intelhex records start with ':', only the head of the file is needed
+        with open(self.fw, 'rb') as f:
+            taolink = not f.read(16).lstrip().startswith(b':')
 
         if taolink:
             logging.info("taolink private format hex file detected")
@@ -297,16 +371,33 @@ class BurnToolHost:
         else:
             logging.info("intelhex format hex file detected")
             self.fw_start_addr, self.fw_end_addr, self.fw_data = intelhex_to_data_array(self.fw)
-        logging.debug(f"{type(self.fw_data)}")
+        logging.debug("%s", type(self.fw_data))
 
         self.fw_crc = zlib.crc32(self.fw_data) & 0xFFFFFFFF
 
 
         logging.info(f"patch: {self.patch}")
-        logging.debug(f"fw: {self.fw_start_addr:08X} - {self.fw_end_addr:08X}, {len(self.fw_data)} bytes, crc: {self.fw_crc:08X}")
+        logging.debug("fw: %08X - %08X, %d bytes, crc: %08X", self.fw_start_addr, self.fw_end_addr, len(self.fw_data), self.fw_crc)
 
-        self.serial = BurnToolSerial(self.on_received, self.on_failed)
+        # serial rx thread only queues bytes, frames are parsed on rx_thread
+        self.serial = BurnToolSerial(None, self.on_failed)
         self.serial.start(port, 115200, 8, 1, 'None')
+        self.rx_thread = Thread(target=self._rx_loop, daemon=True)
+        self.rx_thread.start()
+
+    def _rx_loop(self):
+        while not self.serial.stop_event.is_set():
+            data = self.serial.drain(0.05)
+            if not data:
+                continue
+            # same failure handling as the serial rx thread this used to run on
+            try:
+                self.on_received(data)
+            except IOError as e:
+                logging.warning("%s", e, exc_info=True)
+                self.on_failed()
+            except Exception:
+                logging.exception("on_received failed")
 
     def set_sta(self, sta):
         if sta == BurnToolStatus.IDLE:
@@ -316,26 +407,26 @@ class BurnToolHost:
             if self.sta != sta:
                 self.evtq.put(BurnToolEvent.CONNECTED)
         self.sta = sta
-        logging.debug(f"set sta {sta}")
+        logging.debug("set sta %s", sta)
 
     def on_received(self, data):
         if self.sta == BurnToolStatus.IDLE:
-            try:
-                self.wait_data += data
-                # logging.info(f"on_received: {self.wait_data.hex()}")
-                if self.wait_data.find('TurMass.'.encode('utf-8')) >= 0:
-                    self.serial.write('TaoLink.'.encode('utf-8'))
-                    self.wait_data = b''
-                    self.wait_ack = True
-                if self.wait_ack:
-                    if self.wait_data.find('ok'.encode('utf-8')) >= 0:
-                        if not self.wait:
-                            self.set_sta(BurnToolStatus.CONNECTED)
-                        logging.warning(f"connected")
-                        self.wait_data = b''
-            except:
-                logging.error(f"{traceback.format_exc()}")
-            logging.debug(f"on_received: {data}")
+            self.wait_data.extend(data)
+            # logging.info(f"on_received: {self.wait_data.hex()}")
+            if _TURMASS in self.wait_data:
+                self.serial.write(_TAOLINK)
+                self.wait_data.clear()
+                self.wait_ack = True
+            if self.wait_ack:
+                if _OK in self.wait_data:
+                    if not self.wait:
+                        self.set_sta(BurnToolStatus.CONNECTED)
+                    logging.warning(f"connected")
+                    self.wait_data.clear()
+            # keep only a tail long enough to complete a token split across reads
+            if len(self.wait_data) > 64:
+                del self.wait_data[:-(len(_TURMASS) - 1)]
+            logging.debug("on_received: %s", data)
         elif self.sta == BurnToolStatus.CONNECTED:
             self.rxpkt.rx(data)
 
@@ -349,15 +440,79 @@ class BurnToolHost:
             self.serial.write(data)
             try:
                 opcode, address, length, data = self.rxpkt.rxq.get(timeout=timeout)
-                logging.info(f"rxpkt header: {opcode:02X}, 0x{address:08X}, {length}")
-                if data:
-                    logging.info(f"rxpkt data: {data.hex()}")
+                logging.debug("rxpkt header: %02X, 0x%08X, %d", opcode, address, length)
+                if data and logging.getLogger().isEnabledFor(logging.DEBUG):
+                    logging.debug("rxpkt data: %s", data.hex())
                 return opcode, address, length, data
             except Empty:
                 logging.warning("rxpkt timeout")
                 continue
         return None, None, 0, b''
 
+    def send_async(self, opcode, address, msg, ack, timeout=0.5):
+        data = self.frame.pack(opcode, address, msg)
+        self.serial.write(data)
+        w = BurnToolPendingWrite(ack, data, time.monotonic() + timeout, timeout)
+        self.pending[address] = w
+        heapq.heappush(self.deadlines, (w.deadline, address))
+
+    def drain_acks(self, max_pending=0):
+        while len(self.pending) > max_pending:
+            # retransmit every frame whose ack is overdue, entries of acked
+            # or already retransmitted frames are stale and just dropped
+            now = time.monotonic()
+            while self.deadlines[0][0] <= now:
+                deadline, address = heapq.heappop(self.deadlines)
+                w = self.pending.get(address)
+                if w is None or w.deadline != deadline:
+                    continue
+                w.tries += 1
+                if w.tries >= 3:
+                    logging.error(f"no ack for 0x{address:08X}")
+                    return False
+                logging.warning("rxpkt timeout")
+                self.serial.write(w.frame)
+                w.deadline = now + w.timeout
+                heapq.heappush(self.deadlines, (w.deadline, address))
+                # the earlier copy may have been slow rather than lost
+                self.late_acks += 1
+                self.late_deadline = w.deadline
+
+            try:
+                opcode, address, length, data = self.rxpkt.rxq.get(timeout=self.deadlines[0][0] - now)
+            except Empty:
+                continue
+
+            w = self.pending.get(address)
+            if w is None:
+                # late ack of a frame that was already retransmitted and acked
+                logging.warning(f"unexpected ack: {opcode:02X}, 0x{address:08X}")
+                self.late_acks = max(0, self.late_acks - 1)
+                continue
+            if opcode != w.ack:
+                logging.error(f"bad ack: {opcode:02X}, 0x{address:08X}")
+                return False
+            del self.pending[address]
+
+        if max_pending == 0:
+            self.discard_late_acks()
+        return True
+
+    def discard_late_acks(self):
+        # a resent frame may still be acked twice, swallow the extra acks so
+        # the next request() does not take one as its own reply
+        while self.late_acks > 0:
+            timeout = self.late_deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                opcode, address, length, data = self.rxpkt.rxq.get(timeout=timeout)
+            except Empty:
+                break
+            logging.debug("late ack: %02X, 0x%08X", opcode, address)
+            self.late_acks -= 1
+        self.late_acks = 0
+
     def reqeust_change_baudrate(self):
         data = self.frame.pack(
         BurnToolOpCode.UP_OPCODE_CHANGE_BAUDRATE.value, 921600, b'')
@@ -395,7 +550,7 @@ class BurnToolHost:
                 patch += b'\x00' * (512 - len(patch) % 512)
             logging.info(f"patch size {len(patch)}")
             for i in range(0, len(patch), 512):
-                logging.info(f"patch addr {i}")
+                logging.debug("patch addr %d", i)
                 opcode, address, length, data = self.request(
                     BurnToolOpCode.UP_OPCODE_WRITE_RAM.value,
                     start_addr + i,
@@ -430,6 +585,17 @@ class BurnToolHost:
     def run_change_baud_rate(self):
         return self.reqeust_change_baudrate()
 
+    def write_page(self, address, page):
+        # stop-and-wait only checks the ack opcode, windowed writes match
+        # acks by the page address the bootloader echoes in WRITE_ACK
+        if self.window == 1:
+            opcode, _, _, _ = self.request(_OP_WRITE, address, page)
+            return opcode == _OP_WRITE_ACK
+        if not self.drain_acks(self.window - 1):
+            return False
+        self.send_async(_OP_WRITE, address, page, _OP_WRITE_ACK)
+        return True
+
     def run_program_flash(self):
         sector_size = 256
         addr_oft = 0xC2000000
@@ -437,9 +603,10 @@ class BurnToolHost:
         max_size = 0x0002FFF8
         tail = self.fw_tail
 
-        start_addr, end_addr, fw = (self.fw_start_addr, self.fw_end_addr, self.fw_data.copy())
+        # pages are sliced from a view of the image, nothing is copied up front
+        start_addr, end_addr, fw = (self.fw_start_addr, self.fw_end_addr, memoryview(self.fw_data))
 
-        logging.debug(f"fw: {start_addr:08X} - {end_addr:08X}, {len(fw)} bytes")
+        logging.debug("fw: %08X - %08X, %d bytes", start_addr, end_addr, len(fw))
 
         start_addr -= addr_oft
         end_addr -= addr_oft
@@ -449,38 +616,45 @@ class BurnToolHost:
             logging.error("fw size too large")
             return False
 
-        # last sector
+        # last sector, a partial trailing sector is padded in its own small buffer
         if len(fw) > last_page_addr:
-            fw_last_page = fw[last_page_addr:]
+            fw_last_page = bytearray(fw[last_page_addr:])
             fw = fw[:last_page_addr]
+            fw_pad_page = b''
         else:
-            fw_last_page = b''
-            fw += b'\xFF' * ((sector_size - len(fw) % sector_size) % sector_size)
+            fw_last_page = bytearray()
+            full = len(fw) - len(fw) % sector_size
+            fw_pad_page = bytes(fw[full:])
+            if fw_pad_page:
+                fw_pad_page += b'\xFF' * (sector_size - len(fw_pad_page))
+            fw = fw[:full]
         fw_last_page += b'\xFF' * (sector_size - 8 - len(fw_last_page)) + tail
 
-        logging.debug(f"aligned fw: {len(fw)} bytes, {len(fw) // sector_size} pages,{fw[-sector_size:].hex()}")
-        logging.debug(f"aligned fw last page: {len(fw_last_page)}, {fw_last_page.hex()}")
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            aligned = len(fw) + len(fw_pad_page)
+            last = fw_pad_page or fw[-sector_size:]
+            logging.debug("aligned fw: %d bytes, %d pages,%s", aligned, aligned // sector_size, last.hex())
+            logging.debug("aligned fw last page: %d, %s", len(fw_last_page), fw_last_page.hex())
+
+        self.pending.clear()
+        self.deadlines.clear()
+        self.late_acks = 0
 
-        # fw area
+        # fw area, up to self.window pages in flight
         for i in range(len(fw) // sector_size):
-            opcode, address, length, data = self.request(
-                BurnToolOpCode.UP_OPCODE_WRITE.value,
-                start_addr + i * sector_size,
-                fw[i * sector_size:(i + 1) * sector_size]
-            )
-            if opcode != BurnToolOpCode.UP_OPCODE_WRITE_ACK.value:
+            if not self.write_page(start_addr + i * sector_size, fw[i * sector_size:(i + 1) * sector_size]):
+                return False
+
+        # the padded trailing sector
+        if fw_pad_page:
+            if not self.write_page(start_addr + len(fw), fw_pad_page):
                 return False
 
         # the last page
-        opcode, address, length, data = self.request(
-            BurnToolOpCode.UP_OPCODE_WRITE.value,
-            last_page_addr,
-            fw_last_page
-        )
-        if opcode != BurnToolOpCode.UP_OPCODE_WRITE_ACK.value:
+        if not self.write_page(last_page_addr, fw_last_page):
             return False
 
-        return True
+        return self.drain_acks(0)
 
     def run_crc_check(self):
         start_addr = 0xc2000000
@@ -552,7 +726,7 @@ class BurnToolHost:
                 break
         logging.info(f"cost: {time.time() - self.ts:.3}s")
         self.serial.stop()
-        self.rxpkt.timer.destory()
+        self.rx_thread.join()
 
 #---------------------------------------------------------------------------------------------
 # Device
@@ -560,47 +734,58 @@ class BurnToolDevice:
     def __init__(self, port, debug=False):
         log_set_level(debug)
         self.port = port
+        self._events = Queue()
         self.serial = BurnToolSerial(self.on_received, self.on_failed)
         self.serial.start(port, 115200, 8, 1, 'None')
         self.sta = BurnToolStatus.IDLE
-        self.rxsta = BurnToolRxStatus.HEAD
-        self.rxdata = b''
-        self.rxlen = 0
+        self.rxpkt = BurnToolRxPkt()
         self.frame = BurnToolFrame()
+        self._tx_buf = bytearray()
 
-        self.ts = int(time.time() * 1000)
-        self.lock = threading.Lock()
+        self.ts = time.monotonic_ns()
 
     def set_sta(self, sta):
         self.sta = sta
-        logging.debug(f"set sta {sta}")
+        logging.debug("set sta %s", sta)
 
+    # only called from the run thread, so no locking is needed
     def evt(self, event, data=b''):
-        now = int(time.time() * 1000)
-        self.lock.acquire()
-        if self.sta == BurnToolStatus.IDLE:
-            if event == BurnToolEvent.DATA:
-                try:
-                    data = data.decode('utf-8')
-                    logging.debug(f"{data}")
-                    if 'TaoLink.' in data:
-                        self.serial.write('ok'.encode('utf-8'))
+        try:
+            if self.sta == BurnToolStatus.IDLE:
+                if event == BurnToolEvent.DATA:
+                    logging.debug("%s", data)
+                    if _TAOLINK in data:
+                        self._tx_buf += _OK
                         self.set_sta(BurnToolStatus.CONNECTED)
-                except:
-                    logging.error(f"{traceback.format_exc()}")
-            else:
-                if now - self.ts > 50:
-                    self.serial.write('TurMass.'.encode('utf-8'))
-                    self.ts = now
-        elif self.sta == BurnToolStatus.CONNECTED:
-            if event == BurnToolEvent.DATA:
-                rsp = self.frame.response(data)
-                if rsp:
-                    self.serial.serial.write(rsp)
-        self.lock.release()
+                else:
+                    now = time.monotonic_ns()
+                    if now - self.ts > 50_000_000:
+                        self._tx_buf += _TURMASS
+                        self.ts = now
+            elif self.sta == BurnToolStatus.CONNECTED:
+                if event == BurnToolEvent.DATA:
+                    self.rxpkt.rx(data)
+                    while True:
+                        try:
+                            opcode, address, length, payload = self.rxpkt.rxq.get_nowait()
+                        except Empty:
+                            break
+                        rsp = self.frame.dispatch(opcode, address, payload)
+                        if rsp:
+                            self._tx_buf += rsp
+        finally:
+            # staged replies still go out if handling raised half way
+            self._flush()
+
+    # everything staged by one event goes out with a single write
+    def _flush(self):
+        if self._tx_buf:
+            data = bytes(self._tx_buf)
+            self._tx_buf.clear()
+            self.serial.write(data)
 
     def on_received(self, data):
-        self.evt(BurnToolEvent.DATA, data)
+        self._events.put((BurnToolEvent.DATA, data))
 
     def on_failed(self):
         logging.error(f"on_failed")
@@ -608,8 +793,23 @@ class BurnToolDevice:
     def run(self):
         while True:
             try:
-                self.evt(BurnToolEvent.POLLING)
-                time.sleep(0.01)
+                # beacon 'TurMass.' only while idle, otherwise sleep until rx data arrives
+                if self.sta == BurnToolStatus.IDLE:
+                    self.evt(BurnToolEvent.POLLING)
+                try:
+                    event, data = self._events.get(timeout=0.05 if self.sta == BurnToolStatus.IDLE else 1)
+                    # coalesce everything the rx thread has already queued
+                    if not self._events.empty():
+                        data = bytearray(data)
+                        while True:
+                            try:
+                                data += self._events.get_nowait()[1]
+                            except Empty:
+                                break
+                        data = bytes(data)
+                    self.evt(event, data)
+                except Empty:
+                    pass
             except KeyboardInterrupt:
                 break
         self.serial.stop()
@@ -619,16 +819,15 @@ class BurnToolDevice:
 class BurnToolParser:
     def __init__(self, port, debug=False):
         log_set_level(debug)
-        self.opcodes = [v.value for _, v in BurnToolOpCode.__members__.items()]
-        logging.debug(f"opcodes: {self.opcodes}")
+        logging.debug("opcodes: %s", sorted(_OPCODE_VALUES))
 
         self.port = port
 
+        self.rxpkt = BurnToolRxPkt()
+
         self.serial = BurnToolSerial(self.on_received, self.on_failed)
         self.serial.start(port, 115200, 8, 1, 'None')
 
-        self.rxpkt = BurnToolRxPkt()
-
     def on_received(self, data):
         self.rxpkt.rx(data)
 
@@ -636,16 +835,18 @@ class BurnToolParser:
         logging.error(f"on_failed")
 
     def run(self):
+        # the 1s timeout lets Ctrl+C through on platforms where an untimed
+        # lock wait is not interrupted (Windows)
         while True:
             try:
-                opcode, address, length, data = self.rxpkt.rxq.get(timeout=0.1)
+                opcode, address, length, data = self.rxpkt.rxq.get(timeout=1)
                 if opcode == BurnToolOpCode.UP_OPCODE_CHANGE_BAUDRATE.value:
                     self.serial.serial.baudrate = address
                     logging.info(f"change baudrate to {self.serial.serial.baudrate}")
 
-                logging.info(f"rxpkt: {opcode:02X}, 0x{address:08X}, {length}")
+                logging.info("rxpkt: %02X, 0x%08X, %d", opcode, address, length)
                 if data:
-                    logging.info(f"rxpkt data: {data.hex()}")
+                    logging.info("rxpkt data: %s", data.hex())
             except Empty:
                 continue
             except KeyboardInterrupt:
@@ -49,8 +49,8 @@ class BurnToolSerial(object):
 
         self.stop_event = threading.Event()
 
-    def start(self, port, baud, bytesize, stopbits, parity, timeout=0):
-        logging.debug(f"serial start, {port}/{baud}/{bytesize}/{stopbits}/{parity}")
+    def start(self, port, baud, bytesize, stopbits, parity, timeout=0.05, inter_byte_timeout=None):
+        logging.debug("serial start, %s/%s/%s/%s/%s", port, baud, bytesize, stopbits, parity)
         if self.serial:
             self.serial.close()
 
@@ -60,7 +60,14 @@ class BurnToolSerial(object):
                                         bytesize=bytesize,
                                         stopbits=stopbits,
                                         parity=PARITY_DICT[parity],
-                                        timeout=timeout)
+                                        timeout=timeout,
+                                        inter_byte_timeout=inter_byte_timeout)
+
+            # Cut the USB-serial driver latency on POSIX, not available everywhere
+            try:
+                self.serial.set_low_latency_mode(True)
+            except (AttributeError, NotImplementedError, ValueError, IOError) as e:
+                logging.debug("low latency mode not set: %s", e)
 
             # Simulate a reset signal through RTS pin
             self.set_rts(False)
@@ -105,6 +112,19 @@ class BurnToolSerial(object):
     def read(self):
         return self.rx_queue.get()
 
+    def drain(self, timeout=None):
+        # wait for the first chunk, then batch whatever else is already queued
+        try:
+            chunks = [self.rx_queue.get(timeout=timeout)]
+        except queue.Empty:
+            return b''
+        while True:
+            try:
+                chunks.append(self.rx_queue.get_nowait())
+            except queue.Empty:
+                break
+        return b''.join(chunks)
+
     def _send(self):
         logging.info('tx thread is started')
         while not self.stop_event.is_set():
@@ -127,7 +147,8 @@ class BurnToolSerial(object):
         logging.info('rx thread is started')
         while not self.stop_event.is_set():
             try:
-                data = self.serial.read(1)
+                # block for the first byte, then take what is buffered, up to 4 KiB
+                data = self.serial.read(max(1, min(self.serial.in_waiting, 4096)))
                 if data:
                     # logging.info(f'serial rx:{data.hex()}')
                     if self.on_received:
@@ -1,25 +1,37 @@
 
+import re
+from array import array
+
 from intelhex import IntelHex
 
+_CARR_HEX_RE = re.compile(r'0x([0-9a-fA-F]+)')
+
+# array typecodes used to byte-swap fixed width words in one call
+_SWAP_TYPECODES = {array(tc).itemsize: tc for tc in 'HILQ'}
+
 def base16_to_bin(in_file, out_file):
-    data = b''
     with open(in_file, 'r') as f:
-        for line in f:
-            data += bytes.fromhex(line)
+        text = f.read()
 
     with open(out_file, 'wb') as f:
-        f.write(data)
+        f.write(bytes.fromhex(''.join(text.split())))
 
 def carr_to_bin(in_file, out_file):
-    data = b''
     with open(in_file, 'r') as f:
-        for line in f:
-            if '0x' in line:
-                x = line.strip().replace(',', '')[2:]
-                # print(f"{x}")
-                res = bytes.fromhex(x)[::-1]
-                # print(f"res: {res.hex()}")
-                data += res
+        words = _CARR_HEX_RE.findall(f.read())
+
+    width = len(words[0]) // 2 if words else 0
+    tc = _SWAP_TYPECODES.get(width)
+    if all(len(x) == 2 * width for x in words) and (width == 1 or tc):
+        # same width everywhere: decode once, then swap every word in C
+        data = bytes.fromhex(''.join(words))
+        if tc:
+            swapped = array(tc, data)
+            swapped.byteswap()
+            data = swapped.tobytes()
+    else:
+        data = b''.join(bytes.fromhex(x)[::-1] for x in words)
+
     with open(out_file, 'wb') as f:
         f.write(data)
 
@@ -28,14 +40,11 @@ def intelhex_to_data_array(hex_file_path):
     ih = IntelHex(hex_file_path)
 
     # Determine the starting and ending addresses
-    start_addr = min(ih.addresses())
-    end_addr =  max(ih.addresses())
+    start_addr = ih.minaddr()
+    end_addr = ih.maxaddr()
 
-    # Fill the initial part of the array with 0xFF up to the starting address
-    data_array = []
-    # Append the actual data from the HEX file
-    for addr in range(start_addr, end_addr + 1):
-        data_array.append(ih[addr])
+    # Gaps between records are filled with ih.padding (0xFF)
+    data_array = ih.tobinarray(start=start_addr, end=end_addr)
 
     return start_addr, end_addr, bytearray(data_array)
 
@@ -51,11 +60,8 @@ def data_array_to_intelhex(hex_file_path, start_address, data):
     ih.write_hex_file(hex_file_path)
 
 def taolink_hex_to_data_array(hex_file_path):
-    bin = b''
     with open(hex_file_path, 'r') as f:
-        for l in f.readlines():
-            h = bytes.fromhex(l)[::-1]
-            bin += h
+        bin = b''.join(bytes.fromhex(l)[::-1] for l in f)
 
     return 0xC2000000, 0xC2000000 + len(bin), bytearray(bin)
 